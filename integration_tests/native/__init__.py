@@ -1,2 +1,4 @@
 from .testLoopback import *
 from .testRegDev import *
+from .testPty import *
+from .testBenchmark import *
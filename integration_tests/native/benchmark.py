@@ -0,0 +1,263 @@
+"""
+Throughput and latency benchmarks against the native dummy devices
+
+Run from the top of the repository after building the C code:
+
+    python -m integration_tests.native.benchmark -o bench.json
+
+Each benchmark measures sequential round trips through Host and reports
+messages per second, link bytes per second (both directions), and the p50 and
+p99 round trip latency. Results are written as JSON so they can be compared
+between runs.
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import os.path
+import platform
+import subprocess
+import sys
+import time
+from asciiserialcom.host import Host
+from asciiserialcom.utilities import breakStapledIntoWriteRead
+import trio
+
+# '>', version, app version, command, '.', 4 CRC characters, and '\n'
+FRAME_OVERHEAD = 10
+# stream frame number and ','
+STREAM_OVERHEAD = 3
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return None
+    iValue = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[iValue]
+
+
+def check_finished(finished, name, timeout):
+    """
+    Raises instead of letting a benchmark that timed out report partial results
+    """
+    if not finished:
+        raise trio.TooSlowError(f"{name} benchmark didn't finish in {timeout} s")
+
+
+def summarize(latencies, nBytes):
+    """
+    Turns a list of round trip latencies (s) and the total number of bytes
+    sent and received into a result dictionary
+    """
+    total = sum(latencies)
+    latencies = sorted(latencies)
+    return {
+        "n": len(latencies),
+        "total_s": total,
+        "messages_per_s": len(latencies) / total,
+        "bytes_per_s": nBytes / total,
+        "latency_p50_s": percentile(latencies, 0.5),
+        "latency_p99_s": percentile(latencies, 0.99),
+    }
+
+
+async def bench_send_message(exe, args, nMessages, testData, timeout):
+    nRegisterBits = 32
+    latencies = []
+    nBytes = 0
+    finished = False
+    with trio.move_on_after(timeout) as cancel_scope:
+        async with await trio.open_process(
+            [exe] + args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ) as device:
+            host_w, host_r = breakStapledIntoWriteRead(device.stdio)
+            send_chan, recv_chan = trio.open_memory_channel(0)
+            async with trio.open_nursery() as nursery:
+                host = Host(nursery, host_r, host_w, nRegisterBits)
+                host.forward_all_received_messages_to(send_chan)
+                for i in range(nMessages):
+                    starttime = time.perf_counter()
+                    await host.send_message(b"z", testData)
+                    msg = await recv_chan.receive()
+                    latencies.append(time.perf_counter() - starttime)
+                    assert msg.data == testData
+                    nBytes += 2 * (len(testData) + FRAME_OVERHEAD)
+                finished = True
+                cancel_scope.cancel()
+    check_finished(finished, "send_message", timeout)
+    return summarize(latencies, nBytes)
+
+
+async def bench_send_stream_message(exe, args, nMessages, testData, timeout):
+    nRegisterBits = 32
+    latencies = []
+    nBytes = 0
+    finished = False
+    with trio.move_on_after(timeout) as cancel_scope:
+        async with await trio.open_process(
+            [exe] + args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ) as device:
+            host_w, host_r = breakStapledIntoWriteRead(device.stdio)
+            send_chan, recv_chan = trio.open_memory_channel(0)
+            async with trio.open_nursery() as nursery:
+                host = Host(nursery, host_r, host_w, nRegisterBits)
+                host.forward_received_s_messages_to(send_chan)
+                for i in range(nMessages):
+                    starttime = time.perf_counter()
+                    await host.send_stream_message(testData)
+                    nMissed, payload = await recv_chan.receive()
+                    latencies.append(time.perf_counter() - starttime)
+                    assert nMissed == 0
+                    assert payload == testData
+                    nBytes += 2 * (len(testData) + FRAME_OVERHEAD + STREAM_OVERHEAD)
+                finished = True
+                cancel_scope.cancel()
+    check_finished(finished, "send_stream_message", timeout)
+    return summarize(latencies, nBytes)
+
+
+async def bench_registers(exe, nMessages, timeout):
+    nRegisterBits = 8
+    nRegisters = 10
+    # data is 4 hex digit reg num plus ',' and 2 hex digit value if present
+    nBytesWrite = (7 + FRAME_OVERHEAD) + (4 + FRAME_OVERHEAD)
+    nBytesRead = (4 + FRAME_OVERHEAD) + (7 + FRAME_OVERHEAD)
+    wlatencies = []
+    rlatencies = []
+    finished = False
+    with trio.move_on_after(timeout) as cancel_scope:
+        async with await trio.open_process(
+            [exe],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ) as device:
+            host_w, host_r = breakStapledIntoWriteRead(device.stdio)
+            async with trio.open_nursery() as nursery:
+                host = Host(nursery, host_r, host_w, nRegisterBits)
+                for i in range(nMessages):
+                    regNum = i % nRegisters
+                    regVal = i % 2 ** nRegisterBits
+                    starttime = time.perf_counter()
+                    await host.write_register(regNum, regVal)
+                    wlatencies.append(time.perf_counter() - starttime)
+                    starttime = time.perf_counter()
+                    result = await host.read_register(regNum)
+                    rlatencies.append(time.perf_counter() - starttime)
+                    assert result == regVal
+                finished = True
+                cancel_scope.cancel()
+    check_finished(finished, "register", timeout)
+    return {
+        "write_register": summarize(wlatencies, nBytesWrite * nMessages),
+        "read_register": summarize(rlatencies, nBytesRead * nMessages),
+    }
+
+
+def git_revision(path):
+    """
+    Returns the commit checked out in the git repository at path, or None if
+    path isn't the top of one (e.g. an uninitialized submodule) or git isn't
+    installed
+    """
+
+    def run_git(*args):
+        result = subprocess.run(
+            ["git", "-C", path] + list(args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        if result.returncode != 0:
+            return None
+        return result.stdout.decode().strip()
+
+    try:
+        # git looks in parent directories, so an empty submodule directory
+        # would otherwise give the superproject's commit
+        toplevel = run_git("rev-parse", "--show-toplevel")
+        if toplevel is None or not os.path.samefile(toplevel, path):
+            return None
+        return run_git("rev-parse", "HEAD")
+    except FileNotFoundError:
+        return None
+
+
+async def run_benchmarks(exedir, nMessages, timeout):
+    loopback_exe = os.path.join(exedir, "ascii_serial_com_dummy_loopback_device")
+    register_exe = os.path.join(exedir, "ascii_serial_com_dummy_register_device")
+    results = {}
+    for name, args in [("raw_loopback", ["-l"]), ("asc_loopback", [])]:
+        results[name] = {}
+        for testData in [b"", b"x" * 54]:
+            results[name][f"send_message_{len(testData)}"] = await bench_send_message(
+                loopback_exe, args, nMessages, testData, timeout
+            )
+        for testData in [b"", b"x" * 51]:
+            results[name][
+                f"send_stream_message_{len(testData)}"
+            ] = await bench_send_stream_message(
+                loopback_exe, args, nMessages, testData, timeout
+            )
+    results["register"] = await bench_registers(register_exe, nMessages, timeout)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark Host against the native dummy devices"
+    )
+    parser.add_argument(
+        "-o", "--output", help="JSON output file (default: stdout)", default=None
+    )
+    parser.add_argument(
+        "-n",
+        "--nMessages",
+        help="Number of round trips per benchmark",
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        "-t",
+        "--timeout",
+        help="Timeout for each benchmark (s)",
+        type=float,
+        default=60.0,
+    )
+    parser.add_argument("--CC", default="gcc")
+    parser.add_argument("--build_type", default="debug")
+    args = parser.parse_args()
+    if args.nMessages < 1:
+        parser.error("nMessages must be at least 1")
+
+    exedir = "c-source/build/{}_{}_{}".format("native", args.CC, args.build_type)
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "commit": git_revision("."),
+        "c_source_commit": git_revision("c-source"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "exedir": exedir,
+        "nMessages": args.nMessages,
+        "results": trio.run(run_benchmarks, exedir, args.nMessages, args.timeout),
+    }
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(report, outfile, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
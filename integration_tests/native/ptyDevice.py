@@ -0,0 +1,185 @@
+"""
+Virtual serial device on a pty pair, for testing without hardware
+
+The host side opens PtyDevice.slave_path just like /dev/ttyACM0, so the
+tty-level code paths (setup_tty, tcflush, file-based reads) are exercised,
+while a device (a program like a native C dummy device, or a Python device
+model) runs behind the pty master.
+"""
+
+import logging
+import os
+import subprocess
+import tty
+import trio
+import trio.testing
+
+
+class _Pacer:
+    """
+    Holds a byte stream to a fixed time per byte, in steps of about 1 ms
+    """
+
+    def __init__(self, byte_time, max_chunk_size=None):
+        self.byte_time = byte_time
+        self.chunk_size = max(1, int(1e-3 / byte_time))
+        if max_chunk_size is not None:
+            self.chunk_size = min(self.chunk_size, max_chunk_size)
+        self.step_time = self.chunk_size * byte_time
+        self.clock = None
+
+    async def wait(self, nBytes):
+        """
+        Sleeps until nBytes more have passed
+
+        Small lags from sleep wakeup latency are absorbed so they don't add
+        up over a long transfer; the clock only restarts after being idle.
+        """
+        now = trio.current_time()
+        if self.clock is None or now > self.clock + self.step_time:
+            self.clock = now
+        self.clock += nBytes * self.byte_time
+        await trio.sleep_until(self.clock)
+
+
+class PtyDevice:
+    """
+    Runs a device behind a pty pair and relays bytes at a link speed
+
+    device is either a command line to run, e.g. [exe, "-l"], or an async
+    function device(receive_stream, send_stream) that models the device in
+    this process using trio byte streams.
+
+    Each byte takes 10 bits (8N1) at baud plus inter_byte_delay seconds in
+    each direction.
+
+    Bytes from the host arrive over the link into a receive buffer of
+    buffer_size bytes, standing in for the device's UART buffer. The device
+    takes bytes out of it at device_rate bytes per second, or as fast as it
+    accepts them if device_rate is None. A byte that arrives while the buffer
+    is full is dropped and counted in nDropped. buffer_size of None means the
+    buffer never overflows.
+
+    Start with nursery.start(device.run); slave_path is set once it's started.
+    """
+
+    def __init__(
+        self,
+        device,
+        baud=9600,
+        inter_byte_delay=0.0,
+        buffer_size=None,
+        device_rate=None,
+    ):
+        self.device = device
+        self.byte_time = 10.0 / baud + inter_byte_delay
+        self.buffer_size = buffer_size
+        self.device_rate = device_rate
+        self.nDropped = 0
+        self.slave_path = None
+        # bytes written by the host that haven't crossed the link yet
+        self._tx_buffer = bytearray()
+        self._tx_event = trio.Event()
+        # the device's receive buffer
+        self._rx_buffer = bytearray()
+        self._rx_event = trio.Event()
+
+    async def run(self, task_status=trio.TASK_STATUS_IGNORED):
+        master_fd, slave_fd = os.openpty()
+        try:
+            # FdStream owns master_fd from here, so it's closed even if the
+            # device fails to start
+            async with trio.lowlevel.FdStream(master_fd) as master:
+                tty.setraw(slave_fd)
+                self.slave_path = os.ttyname(slave_fd)
+                if callable(self.device):
+                    to_device_w, to_device_r = trio.testing.memory_stream_one_way_pair()
+                    from_device_w, from_device_r = (
+                        trio.testing.memory_stream_one_way_pair()
+                    )
+                    async with trio.open_nursery() as nursery:
+                        nursery.start_soon(
+                            self._run_device_function, to_device_r, from_device_w
+                        )
+                        await self._relay(
+                            master, to_device_w, from_device_r, task_status
+                        )
+                else:
+                    async with await trio.open_process(
+                        self.device,
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.DEVNULL,
+                    ) as process:
+                        await self._relay(
+                            master, process.stdin, process.stdout, task_status
+                        )
+        finally:
+            # keeping the slave open until now means the master never sees EIO
+            # when the host closes its end
+            os.close(slave_fd)
+
+    async def _relay(self, master, device_w, device_r, task_status):
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(self._receive_from_host, master)
+            nursery.start_soon(self._send_over_link)
+            nursery.start_soon(self._send_to_device, device_w)
+            nursery.start_soon(self._send_to_host, device_r, master)
+            logging.debug(f"PtyDevice {self.device} on {self.slave_path}")
+            task_status.started()
+
+    async def _run_device_function(self, receive_stream, send_stream):
+        async with send_stream:
+            await self.device(receive_stream, send_stream)
+
+    async def _receive_from_host(self, master):
+        while True:
+            data = await master.receive_some()
+            self._tx_buffer += data
+            self._tx_event.set()
+
+    async def _send_over_link(self):
+        # a step never brings in more than fits in an empty receive buffer
+        pacer = _Pacer(self.byte_time, self.buffer_size)
+        while True:
+            await self._tx_event.wait()
+            self._tx_event = trio.Event()
+            while self._tx_buffer:
+                nBytes = min(pacer.chunk_size, len(self._tx_buffer))
+                await pacer.wait(nBytes)
+                data = self._tx_buffer[:nBytes]
+                del self._tx_buffer[:nBytes]
+                if self.buffer_size is not None:
+                    nFree = self.buffer_size - len(self._rx_buffer)
+                    if nBytes > nFree:
+                        self.nDropped += nBytes - nFree
+                        logging.debug(f"PtyDevice dropped {nBytes - nFree} bytes")
+                        data = data[:nFree]
+                self._rx_buffer += data
+                self._rx_event.set()
+
+    async def _send_to_device(self, device_w):
+        pacer = None
+        if self.device_rate is not None:
+            pacer = _Pacer(1.0 / self.device_rate)
+        while True:
+            await self._rx_event.wait()
+            self._rx_event = trio.Event()
+            while self._rx_buffer:
+                if pacer is None:
+                    nBytes = len(self._rx_buffer)
+                else:
+                    nBytes = min(pacer.chunk_size, len(self._rx_buffer))
+                    await pacer.wait(nBytes)
+                data = bytes(self._rx_buffer[:nBytes])
+                del self._rx_buffer[:nBytes]
+                await device_w.send_all(data)
+
+    async def _send_to_host(self, device_r, master):
+        pacer = _Pacer(self.byte_time)
+        while True:
+            data = await device_r.receive_some(pacer.chunk_size)
+            if not data:
+                return
+            await pacer.wait(len(data))
+            await master.send_all(data)
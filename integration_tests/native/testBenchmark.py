@@ -0,0 +1,26 @@
+import unittest
+from .benchmark import percentile, summarize
+
+
+class TestBenchmarkSummary(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        values = list(range(1, 1001))
+        self.assertEqual(percentile(values, 0.5), 500)
+        self.assertEqual(percentile(values, 0.99), 990)
+        self.assertEqual(percentile([5], 0.5), 5)
+        self.assertEqual(percentile([5], 0.99), 5)
+        self.assertEqual(percentile([1, 2], 0.5), 1)
+        self.assertEqual(percentile([1, 2], 0.99), 2)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_summarize(self):
+        result = summarize([0.25, 0.75, 0.5, 0.5], 100)
+        self.assertEqual(result["n"], 4)
+        self.assertEqual(result["total_s"], 2.0)
+        self.assertEqual(result["messages_per_s"], 2.0)
+        self.assertEqual(result["bytes_per_s"], 50.0)
+        self.assertEqual(result["latency_p50_s"], 0.5)
+        self.assertEqual(result["latency_p99_s"], 0.75)
@@ -0,0 +1,233 @@
+import os
+import os.path
+import random
+import time
+import unittest
+import termios
+from asciiserialcom.host import Host
+from asciiserialcom.errors import *
+from asciiserialcom.tty_utils import setup_tty
+from .ptyDevice import PtyDevice
+import trio
+
+alphabytes = b"abcdefghijklmnopqrstuvwxyz"
+alphanumeric = alphabytes + bytes(alphabytes).upper() + b"0123456789"
+
+
+class TestPtyLoopback(unittest.TestCase):
+    """
+    Runs the native loopback device behind a pty pair, so the host goes
+    through the same tty code paths as with a board on /dev/ttyACM0
+    """
+
+    def setUp(self):
+        self.env = os.environ.copy()
+        platform = "native"
+        CC = "gcc"
+        build_type = "debug"
+        self.env.update({"platform": platform, "CC": CC, "build_type": build_type})
+        self.exedir = "c-source/build/{}_{}_{}".format(platform, CC, build_type)
+        self.exe = os.path.join(self.exedir, "ascii_serial_com_dummy_loopback_device")
+        self.baud = 115200
+        random.seed(123456789)
+
+    async def write_and_read_back(self, device, test_string):
+        async with await trio.open_file(device.slave_path, "br") as portr:
+            async with await trio.open_file(device.slave_path, "bw") as portw:
+                setup_tty(portr.wrapped, self.baud)
+                termios.tcflush(portr.wrapped, termios.TCIFLUSH)
+                await portw.write(test_string)
+                await portw.flush()
+                received_data = b""
+                while len(received_data) < len(test_string) - device.nDropped:
+                    received_data += await portr.read1(len(test_string))
+        return received_data
+
+    def test_just_device(self):
+        test_string = b"abcdefghijklmnop987654321" * 4
+
+        async def run_test(self):
+            got_to_cancel = False
+            with trio.move_on_after(5) as cancel_scope:
+                async with trio.open_nursery() as nursery:
+                    device = PtyDevice([self.exe, "-l"], self.baud)
+                    await nursery.start(device.run)
+                    received_data = await self.write_and_read_back(device, test_string)
+                    self.assertEqual(received_data, test_string)
+                    got_to_cancel = True
+                    nursery.cancel_scope.cancel()
+            self.assertTrue(got_to_cancel)
+
+        trio.run(run_test, self)
+
+    def test_just_device_link_speed(self):
+        test_string = bytes(random.choices(alphanumeric, k=2000))
+        min_time = len(test_string) * 10 / self.baud
+
+        async def run_test(self):
+            got_to_cancel = False
+            with trio.move_on_after(5) as cancel_scope:
+                async with trio.open_nursery() as nursery:
+                    device = PtyDevice([self.exe, "-l"], self.baud)
+                    await nursery.start(device.run)
+                    starttime = time.perf_counter()
+                    received_data = await self.write_and_read_back(device, test_string)
+                    deltat = time.perf_counter() - starttime
+                    self.assertEqual(received_data, test_string)
+                    self.assertGreaterEqual(deltat, min_time)
+                    got_to_cancel = True
+                    nursery.cancel_scope.cancel()
+            self.assertTrue(got_to_cancel)
+
+        trio.run(run_test, self)
+
+    def test_just_device_inter_byte_delay(self):
+        test_string = bytes(random.choices(alphanumeric, k=500))
+        inter_byte_delay = 1e-4
+        min_time = len(test_string) * (10 / self.baud + inter_byte_delay)
+
+        async def run_test(self):
+            got_to_cancel = False
+            with trio.move_on_after(5) as cancel_scope:
+                async with trio.open_nursery() as nursery:
+                    device = PtyDevice(
+                        [self.exe, "-l"], self.baud, inter_byte_delay=inter_byte_delay
+                    )
+                    await nursery.start(device.run)
+                    starttime = time.perf_counter()
+                    received_data = await self.write_and_read_back(device, test_string)
+                    deltat = time.perf_counter() - starttime
+                    self.assertEqual(received_data, test_string)
+                    self.assertGreaterEqual(deltat, min_time)
+                    got_to_cancel = True
+                    nursery.cancel_scope.cancel()
+            self.assertTrue(got_to_cancel)
+
+        trio.run(run_test, self)
+
+    def test_python_device_overflow(self):
+        test_string = bytes(random.choices(alphanumeric, k=1000))
+        accepted = bytearray()
+
+        async def loopback_device(receive_stream, send_stream):
+            while True:
+                data = await receive_stream.receive_some()
+                accepted.extend(data)
+                await send_stream.send_all(data)
+
+        async def run_test(self):
+            got_to_cancel = False
+            with trio.move_on_after(5) as cancel_scope:
+                async with trio.open_nursery() as nursery:
+                    # the device takes bytes out of its buffer slower than the link
+                    device = PtyDevice(
+                        loopback_device, self.baud, buffer_size=64, device_rate=2000
+                    )
+                    await nursery.start(device.run)
+                    received_data = await self.write_and_read_back(device, test_string)
+                    self.assertGreater(device.nDropped, 0)
+                    self.assertEqual(len(accepted) + device.nDropped, len(test_string))
+                    self.assertEqual(received_data, accepted)
+                    # what the device accepted is the sent data with gaps
+                    test_string_iter = iter(test_string)
+                    self.assertTrue(all(x in test_string_iter for x in accepted))
+                    got_to_cancel = True
+                    nursery.cancel_scope.cancel()
+            self.assertTrue(got_to_cancel)
+
+        trio.run(run_test, self)
+
+    def test_python_device_burst(self):
+        test_string = bytes(random.choices(alphanumeric, k=5000))
+
+        async def loopback_device(receive_stream, send_stream):
+            while True:
+                data = await receive_stream.receive_some()
+                await send_stream.send_all(data)
+
+        async def run_test(self):
+            got_to_cancel = False
+            with trio.move_on_after(5) as cancel_scope:
+                async with trio.open_nursery() as nursery:
+                    # the device keeps up with the link, so a burst much bigger
+                    # than the buffer shouldn't overflow it
+                    device = PtyDevice(loopback_device, self.baud, buffer_size=64)
+                    await nursery.start(device.run)
+                    received_data = await self.write_and_read_back(device, test_string)
+                    self.assertEqual(device.nDropped, 0)
+                    self.assertEqual(received_data, test_string)
+                    got_to_cancel = True
+                    nursery.cancel_scope.cancel()
+            self.assertTrue(got_to_cancel)
+
+        trio.run(run_test, self)
+
+    def test_python_device(self):
+        test_string = bytes(random.choices(alphanumeric, k=200))
+
+        async def loopback_device(receive_stream, send_stream):
+            while True:
+                data = await receive_stream.receive_some()
+                await send_stream.send_all(data)
+
+        async def run_test(self):
+            got_to_cancel = False
+            with trio.move_on_after(5) as cancel_scope:
+                async with trio.open_nursery() as nursery:
+                    device = PtyDevice(loopback_device, self.baud)
+                    await nursery.start(device.run)
+                    received_data = await self.write_and_read_back(device, test_string)
+                    self.assertEqual(received_data, test_string)
+                    got_to_cancel = True
+                    nursery.cancel_scope.cancel()
+            self.assertTrue(got_to_cancel)
+
+        trio.run(run_test, self)
+
+
+class TestPtyRegDev(unittest.TestCase):
+    """
+    Runs Host over a pty against the native register device, opening the
+    port the same way as the Arduino register tests
+    """
+
+    def setUp(self):
+        self.env = os.environ.copy()
+        platform = "native"
+        CC = "gcc"
+        build_type = "debug"
+        self.env.update({"platform": platform, "CC": CC, "build_type": build_type})
+        self.exedir = "c-source/build/{}_{}_{}".format(platform, CC, build_type)
+        self.exe = os.path.join(self.exedir, "ascii_serial_com_dummy_register_device")
+        self.baud = 115200
+        random.seed(123456789)
+
+    def test_register_write_read(self):
+        nRegisterBits = 8
+        nRegisters = 10
+
+        async def run_test(self):
+            all_finished = trio.Event()
+            with trio.move_on_after(10) as cancel_scope:
+                async with trio.open_nursery() as device_nursery:
+                    device = PtyDevice([self.exe], self.baud)
+                    await device_nursery.start(device.run)
+                    async with await trio.open_file(device.slave_path, "br") as portr:
+                        async with await trio.open_file(
+                            device.slave_path, "bw"
+                        ) as portw:
+                            setup_tty(portr.wrapped, self.baud)
+                            termios.tcflush(portr.wrapped, termios.TCIFLUSH)
+                            async with trio.open_nursery() as nursery:
+                                host = Host(nursery, portr, portw, nRegisterBits)
+                                for iReg in range(nRegisters):
+                                    regVal = random.randrange(2 ** nRegisterBits)
+                                    await host.write_register(iReg, regVal)
+                                    content = await host.read_register(iReg)
+                                    self.assertEqual(content, regVal)
+                                all_finished.set()
+                                nursery.cancel_scope.cancel()
+                    device_nursery.cancel_scope.cancel()
+            self.assertTrue(all_finished.is_set())
+
+        trio.run(run_test, self)
@@ -93,6 +93,64 @@ class TestRegisterReadback(unittest.TestCase):
 
         trio.run(run_test, self)
 
+    def test_just_device_pipelined(self):
+        deviceBufferSize = 64
+
+        def make_frame(command, data):
+            frame = ">00{}{}.".format(command, data).encode("ascii")
+            frame += "{:04X}".format(self.crcFunc(frame)).encode("ascii") + b"\n"
+            return frame
+
+        # largest window of w frames (and of r replies) that fits in the buffer
+        nWindow = deviceBufferSize // len(make_frame("w", "0000,00"))
+
+        async def send_window_and_receive(device, frames):
+            await device.stdio.send_all(b"".join(frames))
+            response = b""
+            while response.count(b"\n") < len(frames):
+                response += await device.stdio.receive_some()
+            return response.splitlines(keepends=True)
+
+        async def run_test(self):
+            got_to_cancel = False
+            with trio.move_on_after(5) as cancel_scope:
+                async with await trio.open_process(
+                    [self.exe],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                ) as device:
+                    for i in range(10):
+                        regNums = random.sample(range(10), nWindow)
+                        regVals = [random.randrange(256) for regNum in regNums]
+                        ### Test Write
+                        wmessages = [
+                            make_frame("w", "{:04X},{:02X}".format(regNum, regVal))
+                            for regNum, regVal in zip(regNums, regVals)
+                        ]
+                        wresponses = await send_window_and_receive(device, wmessages)
+                        wresponses_check = [
+                            make_frame("w", "{:04X}".format(regNum))
+                            for regNum in regNums
+                        ]
+                        self.assertEqual(sorted(wresponses), sorted(wresponses_check))
+                        ### Test Readback
+                        rmessages = [
+                            make_frame("r", "{:04X}".format(regNum))
+                            for regNum in regNums
+                        ]
+                        rresponses = await send_window_and_receive(device, rmessages)
+                        rresponses_check = [
+                            make_frame("r", "{:04X},{:02X}".format(regNum, regVal))
+                            for regNum, regVal in zip(regNums, regVals)
+                        ]
+                        self.assertEqual(sorted(rresponses), sorted(rresponses_check))
+                    got_to_cancel = True
+                    cancel_scope.cancel()
+            self.assertTrue(got_to_cancel)
+
+        trio.run(run_test, self)
+
     def test_host_device_8bit(self):
         async def run_test(self):
             nRegisterBits = 8